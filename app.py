@@ -1,27 +1,129 @@
 import os
 import re
-from datetime import datetime, timezone
+import sqlite3
+import string
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from zoneinfo import ZoneInfo 
 IST = ZoneInfo("Asia/Kolkata")
-from statistics import mean
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, create_engine, delete as sql_delete, event, inspect, select, text
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.orm import relationship
-import pandas as pd
+from sqlalchemy.pool import QueuePool, StaticPool
 from io import BytesIO
 
 # --- Config ---
+# Tunables read from the environment: name -> (type, default, minimum)
+ENV_SETTINGS = {
+    'READ_POOL_SIZE': (int, 4, 1),
+    'PDF_DECIMAL_PLACES': (int, 3, 0),
+    'EXPORT_WORKERS': (int, 2, 1),
+}
+
 def create_app():
     app = Flask(__name__, static_url_path='/static', static_folder='static')
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY','dev-secret')
     db_url = os.getenv('DATABASE_URL','sqlite:///hg.db')
+    # Timestamps are stamped and formatted with SQLite's strftime(), so the
+    # app only runs on SQLite
+    backend = make_url(db_url).get_backend_name()
+    if backend != 'sqlite':
+        raise ValueError(f'DATABASE_URL must be a SQLite URL, got {backend!r}')
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    for key, (caster, default, minimum) in ENV_SETTINGS.items():
+        raw = os.getenv(key)
+        try:
+            value = default if raw is None else caster(raw)
+        except ValueError:
+            value = default
+        app.config[key] = value if value >= minimum else default
+    # PDF report number formatter, derived once from config rather than per
+    # cell. /list, CSV and Excel keep their own fixed formatting
+    app.pdf_format_fn = f"{{:.{app.config['PDF_DECIMAL_PLACES']}f}}".format
+    if is_file_sqlite(db_url):
+        # Single shared writer connection; see WRITE_LOCK below
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'poolclass': StaticPool,
+            'connect_args': {'check_same_thread': False},
+        }
     return app
 
+def is_file_sqlite(url: 'str | URL') -> bool:
+    # Parse rather than string-match: str(URL) percent-escapes ':memory:'
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
 app = create_app()
 db = SQLAlchemy(app)
 
+# --- SQLite tuning ---
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA busy_timeout=5000;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-65536;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA foreign_keys=ON;"
+)
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_on_connect(dbapi_conn, conn_record):
+    # Runs on every new DBAPI connection; in-memory databases keep their defaults
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    if not dbapi_conn.execute('PRAGMA database_list').fetchone()[2]:
+        return
+    dbapi_conn.executescript(SQLITE_PRAGMAS)
+
+# --- Connection pools ---
+# One writer connection serialized by WRITE_LOCK plus a small reader pool;
+# WAL lets the readers run while a write transaction is open.
+WRITE_LOCK = threading.Lock()
+
+with app.app_context():
+    write_engine = db.engine
+
+if is_file_sqlite(write_engine.url):
+    read_engine = create_engine(
+        write_engine.url,
+        poolclass=QueuePool,
+        pool_size=app.config['READ_POOL_SIZE'],
+        connect_args={'check_same_thread': False},
+    )
+
+    @event.listens_for(write_engine, 'connect')
+    def _writer_on_connect(dbapi_conn, conn_record):
+        # Let SQLAlchemy emit BEGIN itself (pysqlite would otherwise defer it)
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(write_engine, 'begin')
+    def _writer_on_begin(conn):
+        # Take the write lock up front instead of upgrading mid-transaction
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+else:
+    # In-memory SQLite lives on a single connection, so reads must share it
+    read_engine = write_engine
+
+@contextmanager
+def write_txn():
+    with WRITE_LOCK:
+        try:
+            yield db.session
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_read_caches()
+
 # --- Models ---
 class Pellet(db.Model):
     __tablename__ = 'pellets'
@@ -30,8 +132,17 @@ class Pellet(db.Model):
     pellet_no = db.Column(db.Integer, nullable=False)
     operator = db.Column(db.String(64), nullable=True)
     notes = db.Column(db.String(512), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    measurements = relationship('Measurement', back_populates='pellet', cascade='all, delete-orphan', uselist=False)
+    # Stamped by SQLite (UTC, millisecond precision) rather than a Python datetime per insert.
+    # Rendered into the INSERT, so tables created before this default need no migration.
+    created_at = db.Column(db.DateTime, nullable=False,
+                           default=db.func.strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    # Only used to insert both rows together; reads go through measurement_rows()
+    measurements = relationship('Measurement', back_populates='pellet', cascade='all, delete-orphan',
+                                uselist=False, lazy='raise')
+    __table_args__ = (
+        db.Index('ix_pellets_lot_pno', 'lot_no', 'pellet_no'),  # next_no() per-lot MAX
+        db.Index('ix_pellets_created_at', 'created_at'),        # list/export ordering
+    )
 
 class Measurement(db.Model):
     __tablename__ = 'measurements'
@@ -47,34 +158,167 @@ class Measurement(db.Model):
     minv = db.Column(db.Float, nullable=False)
     diff = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(8), default='mm', nullable=False)
-    pellet = relationship('Pellet', back_populates='measurements')
+    pellet = relationship('Pellet', back_populates='measurements', lazy='raise')
 
 # --- Helpers ---
+_NUM_RE = re.compile(r'(-?\d+(?:[.,]\d+)?)')
+_UNSAFE_FNAME_RE = re.compile(r'[^A-Za-z0-9_-]')
+_NUM_CHARS = '+-.0123456789'
+_UNIT_CHARS = string.ascii_letters
+
 def parse_number(s: str):
-    if s is None:
-        return None
-    m = re.search(r'(-?\d+(?:[.,]\d+)?)', s)
+    # Fast path for plain gauge frames ("+00.289 mm", "0.157mm", "1,5"): drop a
+    # trailing unit and float() the first token when it is only sign/digit/
+    # separator chars and starts with a digit; the regex only sees odd input
+    head = s.split(None, 1)
+    if head:
+        tok = head[0].rstrip(_UNIT_CHARS).replace(',', '.')
+        if not tok.strip(_NUM_CHARS) and tok.lstrip('+-')[:1].isdigit():
+            try:
+                return float(tok)
+            except ValueError:
+                pass
+    m = _NUM_RE.search(s)
     if not m:
         return None
     return float(m.group(1).replace(',', '.'))
 
+# created_at is stored as naive UTC; IST is a fixed +05:30 (no DST), so
+# SQLite can render the display timestamp itself. Cut the fractional seconds
+# off first: SQLite rounds them to the millisecond, Python's strftime truncated
+TS_IST = db.func.strftime('%Y-%m-%d %H:%M:%S', db.func.substr(Pellet.created_at, 1, 19),
+                          '+330 minutes').label('ts_ist')
+
+def lot_arg() -> str:
+    return (request.args.get('lot') or '').strip()
+
+def file_stamp() -> str:
+    return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+def lot_filename(lot: str, ext: str) -> str:
+    return f'lot_{_UNSAFE_FNAME_RE.sub("_",lot)}_{file_stamp()}.{ext}'
+
+def _blank_if_null(col):
+    return db.func.coalesce(col, '').label(col.key)
+
+def measurement_rows():
+    # Flat pellet+measurement rows in one JOIN (no per-pellet lazy loads);
+    # nullable text comes back as '' so callers never need `or ''`
+    return (select(Pellet.id, TS_IST, _blank_if_null(Pellet.lot_no), Pellet.pellet_no,
+                   _blank_if_null(Pellet.operator), _blank_if_null(Pellet.notes),
+                   Measurement.p1, Measurement.p2, Measurement.p3, Measurement.p4, Measurement.p5,
+                   Measurement.avg, Measurement.maxv, Measurement.minv, Measurement.diff,
+                   Measurement.unit)
+            .join(Measurement, Measurement.pellet_id == Pellet.id))
+
+# Statements are built once and bound per call, so every request reuses the
+# same compiled SQL and SQLite's per-connection statement cache
+LIST_ROWS = measurement_rows().order_by(Pellet.created_at.desc()).limit(500)
+ALL_ROWS = measurement_rows().order_by(Pellet.created_at.asc())
+LOT_ROWS = (measurement_rows()
+            .where(Pellet.lot_no == bindparam('lot'))
+            .order_by(Pellet.pellet_no.asc()))
+# /list JSON keys, positionally matching measurement_rows() columns
+LIST_KEYS = ('id', 'ts', 'lot_no', 'pellet_no', 'operator', 'notes',
+             'p1', 'p2', 'p3', 'p4', 'p5', 'avg', 'max', 'min', 'diff', 'unit')
+MAX_NO_ALL = select(db.func.max(Pellet.pellet_no))
+MAX_NO_LOT = MAX_NO_ALL.where(Pellet.lot_no == bindparam('lot'))
+
+# /list cache, cleared on every write. _cache_gen lets a reader that raced a
+# write skip storing what it read.
+_CACHE_LOCK = threading.Lock()
+_cache_gen = 0
+# Recent /list rows as (expires_at, rows); the TTL bounds staleness from
+# writers outside this process
+LIST_CACHE_TTL = 5.0
+_list_cache = None
+
+def invalidate_read_caches():
+    global _cache_gen, _list_cache
+    with _CACHE_LOCK:
+        _cache_gen += 1
+        _list_cache = None
+
+def max_pellet_no(lot: str) -> int:
+    # Not cached: ix_pellets_lot_pno makes this a single index seek, and a
+    # cache would go stale when another process writes
+    with read_engine.connect() as conn:
+        if lot:
+            return conn.scalar(MAX_NO_LOT, {'lot': lot}) or 0
+        return conn.scalar(MAX_NO_ALL) or 0
+
+def recent_rows() -> list:
+    global _list_cache
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        cached = _list_cache
+        gen = _cache_gen
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    with read_engine.connect() as conn:
+        rows = [dict(zip(LIST_KEYS, r)) for r in conn.execute(LIST_ROWS)]
+    with _CACHE_LOCK:
+        if gen == _cache_gen:
+            _list_cache = (now + LIST_CACHE_TTL, rows)
+    return rows
+
+# --- Background exports ---
+# Slow report builds (ReportLab) run on a small worker pool; the browser gets a
+# job id, polls /export/status/<id> and then fetches /export/download/<id>.
+EXPORT_DIR = os.path.join(app.instance_path, 'exports')
+EXPORT_TTL = 3600  # seconds a finished export stays downloadable
+
+class ExportJob:
+    def __init__(self, future, path, download_name):
+        self.future = future
+        self.path = path
+        self.download_name = download_name
+        self.created = time.monotonic()
+
+_export_pool = ThreadPoolExecutor(max_workers=app.config['EXPORT_WORKERS'],
+                                  thread_name_prefix='export')
+_export_jobs: dict[str, ExportJob] = {}
+
+def submit_export(build, arg, download_name: str) -> str:
+    _prune_exports()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(EXPORT_DIR, job_id + os.path.splitext(download_name)[1])
+    _export_jobs[job_id] = ExportJob(_export_pool.submit(build, arg, path), path, download_name)
+    return job_id
+
+def _prune_exports():
+    # Scan the directory rather than the job table so files left by earlier
+    # runs (the table is in-memory only) are cleaned up too
+    cutoff = time.monotonic() - EXPORT_TTL
+    for job_id, job in list(_export_jobs.items()):
+        if job.created < cutoff and job.future.done():
+            _export_jobs.pop(job_id, None)
+    pending = {job.path for job in _export_jobs.values() if not job.future.done()}
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    file_cutoff = time.time() - EXPORT_TTL
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if path not in pending and os.path.getmtime(path) < file_cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
 # --- Routes ---
 @app.route('/')
 def index():
     # Next pellet number overall for convenience (UI will fetch per lot)
-    max_no = db.session.query(db.func.max(Pellet.pellet_no)).scalar() or 0
-    next_no = max_no + 1
+    next_no = max_pellet_no('') + 1
     return render_template('index.html', next_pellet_no=next_no)
 
 @app.get('/next_no')
 def next_no():
-    lot = (request.args.get('lot') or '').strip()
-    if not lot:
-        max_no = db.session.query(db.func.max(Pellet.pellet_no)).scalar() or 0
-        return jsonify({'ok': True, 'next': int(max_no)+1})
-    max_no = (db.session.query(db.func.max(Pellet.pellet_no))
-              .filter(Pellet.lot_no == lot).scalar()) or 0
-    return jsonify({'ok': True, 'next': int(max_no)+1})
+    lot = lot_arg()
+    return jsonify({'ok': True, 'next': int(max_pellet_no(lot))+1})
 
 @app.post('/save')
 def save():
@@ -109,141 +353,122 @@ def save():
     minv = min(readings)
     diff = maxv - minv
 
-    pellet = Pellet(lot_no=lot_no, pellet_no=pellet_no, operator=operator, notes=notes)
-    db.session.add(pellet)
-    db.session.flush()
-
+    # Pellet and its measurement go out in a single flush
     m = Measurement(
-        pellet_id=pellet.id,
         p1=readings[0], p2=readings[1], p3=readings[2], p4=readings[3], p5=readings[4],
         avg=avg, maxv=maxv, minv=minv, diff=diff, unit=unit
     )
-    db.session.add(m)
-    db.session.commit()
-    return jsonify({'ok': True, 'pellet_id': pellet.id})
+    pellet = Pellet(lot_no=lot_no, pellet_no=pellet_no, operator=operator, notes=notes,
+                    measurements=m)
+    with write_txn() as s:
+        s.add(pellet)
+        s.flush()
+        pellet_id = pellet.id
+    return jsonify({'ok': True, 'pellet_id': pellet_id})
 
 @app.get('/list')
 def list_measurements():
-    pellets = (db.session.query(Pellet)
-               .order_by(Pellet.created_at.desc())
-               .limit(500).all())
-    rows = []
-    for p in pellets:
-        utc = p.created_at
-        if utc.tzinfo is None:
-            utc = utc.replace(tzinfo=timezone.utc)
-        ts_ist = utc.astimezone(IST).strftime('%Y-%m-%d %H:%M:%S')
-        if not p.measurements:
-            continue
-        m = p.measurements
-        rows.append({
-            'id': p.id,
-            'ts': ts_ist,
-            'lot_no': p.lot_no or '',
-            'pellet_no': p.pellet_no,
-            'operator': p.operator or '',
-            'p1': m.p1, 'p2': m.p2, 'p3': m.p3, 'p4': m.p4, 'p5': m.p5,
-            'avg': m.avg, 'max': m.maxv, 'min': m.minv, 'diff': m.diff, 'unit': m.unit,
-            'notes': p.notes or ''
-        })
-    return jsonify({'ok': True, 'rows': rows})
+    return jsonify({'ok': True, 'rows': recent_rows()})
+
+# Export columns are fixed, so rows go through one precompiled format call;
+# only the free-text fields can need CSV quoting
+CSV_HEADER = 'Timestamp,Lot No,Pellet No,Operator,P1,P2,P3,P4,P5,Avg,Max,Min,Max-Min,Unit,Notes\n'
+_CSV_ROW = ('{},' * 14 + '{}\n').format
+_CSV_QUOTE_RE = re.compile(r'[,"\r\n]')
+
+def csv_text(v) -> str:
+    if not v:
+        return ''
+    if _CSV_QUOTE_RE.search(v):
+        return '"' + v.replace('"', '""') + '"'
+    return v
+
+def gzip_stream(chunks):
+    # Level 1: CSV compresses well even at the cheapest setting, and the
+    # export stays a stream (wbits=31 writes a gzip container)
+    z = zlib.compressobj(1, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk.encode())
+        if data:
+            yield data
+    yield z.flush()
 
 @app.get('/export/csv')
 def export_csv():
-    pellets = db.session.query(Pellet).order_by(Pellet.created_at.asc()).all()
-    recs = []
-    for p in pellets:
-        utc = p.created_at
-        if utc.tzinfo is None:
-            utc = utc.replace(tzinfo=timezone.utc)
-        ts_ist = utc.astimezone(IST).strftime('%Y-%m-%d %H:%M:%S')
-        m = p.measurements
-        if not m: 
-            continue
-        recs.append({
-            'Timestamp': ts_ist,
-            'Lot No': p.lot_no or '',
-            'Pellet No': p.pellet_no,
-            'Operator': p.operator or '',
-            'P1': m.p1, 'P2': m.p2, 'P3': m.p3, 'P4': m.p4, 'P5': m.p5,
-            'Avg': m.avg, 'Max': m.maxv, 'Min': m.minv, 'Max-Min': m.diff,
-            'Unit': m.unit,
-            'Notes': p.notes or ''
-        })
-    df = pd.DataFrame(recs)
-    buf = BytesIO()
-    df.to_csv(buf, index=False)
-    buf.seek(0)
-    fname = f'height_gauge_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    return send_file(buf, mimetype='text/csv', as_attachment=True, download_name=fname)
+    def generate():
+        yield CSV_HEADER
+        # One chunk per 500-row cursor batch: the reader connection stays open
+        # only while streaming, and the WSGI server writes once per batch
+        with read_engine.connect() as conn:
+            result = conn.execution_options(yield_per=500).execute(ALL_ROWS)
+            for batch in result.partitions():
+                yield ''.join([_CSV_ROW(
+                    r.ts_ist, csv_text(r.lot_no), r.pellet_no, csv_text(r.operator),
+                    r.p1, r.p2, r.p3, r.p4, r.p5,
+                    r.avg, r.maxv, r.minv, r.diff, csv_text(r.unit), csv_text(r.notes)
+                ) for r in batch])
+    fname = f'height_gauge_export_{file_stamp()}.csv'
+    headers = {'Content-Disposition': f'attachment; filename={fname}', 'Vary': 'Accept-Encoding'}
+    # Index by name to get the q-value; `in` ignores 'gzip;q=0'
+    if request.accept_encodings['gzip'] > 0:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(gzip_stream(generate()), mimetype='text/csv', headers=headers)
+    return Response(generate(), mimetype='text/csv', headers=headers)
 
 @app.get('/export/lot/excel')
 def export_lot_excel():
-    lot = (request.args.get('lot') or '').strip()
+    lot = lot_arg()
     if not lot:
         return jsonify({'ok': False, 'error': 'lot required'}), 400
-    pellets = (db.session.query(Pellet).join(Measurement)
-               .filter(Pellet.lot_no == lot)
-               .order_by(Pellet.pellet_no.asc()).all())
-    recs = []
-    for p in pellets:
-        utc = p.created_at
-        if utc.tzinfo is None:
-            utc = utc.replace(tzinfo=timezone.utc)
-        ts_ist = utc.astimezone(IST).strftime('%Y-%m-%d %H:%M:%S')
-        m = p.measurements
-        if not m: continue
-        recs.append({
-            'Timestamp': ts_ist,
-            'Lot': p.lot_no or '',
-            'Pellet No': p.pellet_no,
-            'Operator': p.operator or '',
-            'P1': m.p1, 'P2': m.p2, 'P3': m.p3, 'P4': m.p4, 'P5': m.p5,
-            'Avg': m.avg, 'Max': m.maxv, 'Min': m.minv, 'Max-Min': m.diff,
-            'Unit': m.unit, 'Notes': p.notes or ''
-        })
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    # write_only streams rows out instead of keeping a full cell graph in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Measurements')
+    bold = Font(bold=True)
+    header = []
+    for title in ('Timestamp', 'Lot', 'Pellet No', 'Operator', 'P1', 'P2', 'P3', 'P4', 'P5',
+                  'Avg', 'Max', 'Min', 'Max-Min', 'Unit', 'Notes'):
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = bold
+        header.append(cell)
+    ws.append(header)
+    with read_engine.connect() as conn:
+        for r in conn.execution_options(yield_per=1000).execute(LOT_ROWS, {'lot': lot}):
+            ws.append([
+                r.ts_ist, r.lot_no, r.pellet_no, r.operator,
+                r.p1, r.p2, r.p3, r.p4, r.p5,
+                r.avg, r.maxv, r.minv, r.diff, r.unit, r.notes
+            ])
     buf = BytesIO()
-    df = pd.DataFrame(recs)
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Measurements')
+    wb.save(buf)
     buf.seek(0)
-    fname = f'lot_{re.sub(r"[^A-Za-z0-9_-]","_",lot)}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    fname = lot_filename(lot, 'xlsx')
     return send_file(buf, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
                      as_attachment=True, download_name=fname)
 
-@app.get('/export/lot/pdf')
-def export_lot_pdf():
-    lot = (request.args.get('lot') or '').strip()
-    if not lot:
-        return jsonify({'ok': False, 'error': 'lot required'}), 400
-    pellets = (db.session.query(Pellet).join(Measurement)
-               .filter(Pellet.lot_no == lot)
-               .order_by(Pellet.pellet_no.asc()).all())
+def build_lot_pdf(lot: str, path: str):
     from reportlab.lib.pagesizes import A4, landscape
     from reportlab.lib import colors
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
     from reportlab.lib.styles import getSampleStyleSheet
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=landscape(A4), rightMargin=20,leftMargin=20,topMargin=20,bottomMargin=20)
+    doc = SimpleDocTemplate(path, pagesize=landscape(A4), rightMargin=20,leftMargin=20,topMargin=20,bottomMargin=20)
     styles = getSampleStyleSheet()
     story = []
     story.append(Paragraph(f"Lot Report: {lot}", styles['Title']))
     story.append(Paragraph(datetime.now(tz=IST).strftime("%Y-%m-%d %H:%M:%S IST"), styles['Normal']))
     story.append(Spacer(1, 12))
     data = [["Pellet","Operator","P1","P2","P3","P4","P5","Avg","Max","Min","Max-Min","Unit","Notes","Time"]]
-    for p in pellets:
-        utc = p.created_at
-        if utc.tzinfo is None:
-            utc = utc.replace(tzinfo=timezone.utc)
-        ts_ist = utc.astimezone(IST).strftime('%Y-%m-%d %H:%M:%S')
-        m = p.measurements
-        if not m: continue
-        data.append([
-            f"{p.pellet_no:03d}", p.operator or '',
-            f"{m.p1:.3f}", f"{m.p2:.3f}", f"{m.p3:.3f}", f"{m.p4:.3f}", f"{m.p5:.3f}",
-            f"{m.avg:.3f}", f"{m.maxv:.3f}", f"{m.minv:.3f}", f"{m.diff:.3f}",
-            m.unit, (p.notes or '')[:40], ts_ist
-        ])
+    fmt = app.pdf_format_fn
+    with read_engine.connect() as conn:
+        for r in conn.execute(LOT_ROWS, {'lot': lot}):
+            data.append([
+                f"{r.pellet_no:03d}", r.operator,
+                fmt(r.p1), fmt(r.p2), fmt(r.p3), fmt(r.p4), fmt(r.p5),
+                fmt(r.avg), fmt(r.maxv), fmt(r.minv), fmt(r.diff),
+                r.unit, r.notes[:40], r.ts_ist
+            ])
     tbl = Table(data, repeatRows=1)
     tbl.setStyle(TableStyle([
         ('BACKGROUND',(0,0),(-1,0), colors.HexColor('#222222')),
@@ -255,28 +480,74 @@ def export_lot_pdf():
     ]))
     story.append(tbl)
     doc.build(story)
-    buf.seek(0)
-    fname = f'lot_{re.sub(r"[^A-Za-z0-9_-]","_",lot)}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-    return send_file(buf, mimetype='application/pdf', as_attachment=True, download_name=fname)
+
+@app.get('/export/lot/pdf')
+def export_lot_pdf():
+    lot = lot_arg()
+    if not lot:
+        return jsonify({'ok': False, 'error': 'lot required'}), 400
+    fname = lot_filename(lot, 'pdf')
+    job_id = submit_export(build_lot_pdf, lot, fname)
+    return jsonify({'ok': True, 'job_id': job_id})
+
+@app.get('/export/status/<job_id>')
+def export_status(job_id):
+    job = _export_jobs.get(job_id)
+    if not job:
+        return jsonify({'ok': False, 'error': 'not found'}), 404
+    if not job.future.done():
+        return jsonify({'ok': True, 'state': 'pending'})
+    err = job.future.exception()
+    if err is not None:
+        return jsonify({'ok': False, 'state': 'error', 'error': str(err)})
+    return jsonify({'ok': True, 'state': 'done'})
+
+@app.get('/export/download/<job_id>')
+def export_download(job_id):
+    job = _export_jobs.get(job_id)
+    if (not job or not job.future.done() or job.future.exception() is not None
+            or not os.path.exists(job.path)):
+        return jsonify({'ok': False, 'error': 'not ready'}), 404
+    return send_file(job.path, as_attachment=True, download_name=job.download_name)
 
 @app.post('/delete')
 def delete():
     pellet_id = int(request.form.get('pellet_id','0'))
     if not pellet_id:
         return jsonify({'ok': False, 'error': 'pellet_id required'}), 400
-    p = db.session.get(Pellet, pellet_id)
-    if not p:
+    # Delete by key directly; loading the pellet and its measurement first
+    # only to cascade would cost two extra SELECTs
+    with write_txn() as s:
+        s.execute(sql_delete(Measurement).where(Measurement.pellet_id == pellet_id))
+        deleted = s.execute(sql_delete(Pellet).where(Pellet.id == pellet_id)).rowcount
+    if not deleted:
         return jsonify({'ok': False, 'error': 'not found'}), 404
-    db.session.delete(p)
-    db.session.commit()
     return jsonify({'ok': True})
 
+def init_schema():
+    db.create_all()
+    # create_all() skips existing tables, so indexes added later are created here
+    insp = inspect(db.engine)
+    created = False
+    for table in db.metadata.sorted_tables:
+        existing = {ix['name'] for ix in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created = True
+    if created:
+        # Refresh planner statistics so the new indexes get picked
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
 @app.cli.command('init-db')
 def init_db():
-    db.create_all()
+    init_schema()
+    _prune_exports()
     print("Database initialized.")
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        init_schema()
+    _prune_exports()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -300,10 +300,29 @@ function parseNumber(s){
     if (!lot){ alert('Enter O/P Product Code to export.'); return; }
     window.location.href = '/export/lot/excel?lot=' + encodeURIComponent(lot);
   });
-  if (btnPdf) btnPdf.addEventListener('click', ()=>{
+  if (btnPdf) btnPdf.addEventListener('click', async ()=>{
     const lot = lotNoEl.value.trim();
     if (!lot){ alert('Enter O/P Product Code to export.'); return; }
-    window.location.href = '/export/lot/pdf?lot=' + encodeURIComponent(lot);
+    // PDF is built in the background: queue it, poll, then download
+    btnPdf.disabled = true;
+    try {
+      const res = await fetch('/export/lot/pdf?lot=' + encodeURIComponent(lot));
+      const j = await res.json();
+      if (!j.ok) throw new Error(j.error || 'Export failed');
+      const deadline = Date.now() + 5*60*1000;
+      for (;;){
+        if (Date.now() > deadline) throw new Error('PDF export timed out');
+        await new Promise(r => setTimeout(r, 500));
+        const s = await (await fetch('/export/status/' + j.job_id)).json();
+        if (!s.ok) throw new Error(s.error || 'Export failed');
+        if (s.state === 'done') break;
+      }
+      window.location.href = '/export/download/' + j.job_id;
+    } catch(err){
+      alert(err.message);
+    } finally {
+      btnPdf.disabled = false;
+    }
   });
 
   // ---- Init ----
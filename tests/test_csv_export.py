@@ -0,0 +1,48 @@
+import csv
+import io
+import os
+import random
+import unittest
+
+# Import the app against a throwaway database
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+from app import CSV_HEADER, _CSV_ROW, csv_text
+
+TEXT_CHARS = 'ab ,"\r\n\t\'x;'
+
+
+def parse(text: str) -> list:
+    return list(csv.reader(io.StringIO(text, newline='')))
+
+
+class CsvRowTest(unittest.TestCase):
+    # Round-trip through csv.reader rather than comparing bytes with
+    # csv.writer, whose quoting of '\r' differs between Python versions
+
+    def test_header_parses_to_column_names(self):
+        self.assertEqual(parse(CSV_HEADER), [CSV_HEADER.rstrip('\n').split(',')])
+
+    def test_carriage_return_stays_in_one_record(self):
+        row = _CSV_ROW('ts', '', 1, '', *[0.0] * 9, 'mm', csv_text('bad\rnote'))
+        self.assertEqual(parse(row)[0][-1], 'bad\rnote')
+        self.assertEqual(len(parse(row)), 1)
+
+    def test_random_rows_round_trip(self):
+        rng = random.Random(1234)
+
+        def text():
+            return rng.choice([None, ''.join(rng.choice(TEXT_CHARS) for _ in range(rng.randint(0, 8)))])
+
+        for _ in range(5000):
+            ts, lot, operator, unit, notes = '2026-01-01 10:00:00', text(), text(), text(), text()
+            pellet_no = rng.randint(1, 999)
+            nums = [round(rng.uniform(-10, 10), rng.randint(0, 6)) for _ in range(9)]
+            got = _CSV_ROW(ts, csv_text(lot), pellet_no, csv_text(operator), *nums,
+                           csv_text(unit), csv_text(notes))
+            want = [ts, lot or '', str(pellet_no), operator or '', *map(str, nums),
+                    unit or '', notes or '']
+            self.assertEqual(parse(got), [want])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Import the app against a throwaway database
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+import app as hg
+
+
+class ExportJobTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with hg.app.app_context():
+            hg.init_schema()
+        cls.client = hg.app.test_client()
+        res = cls.client.post('/save', json={
+            'lot_no': 'LOT-T', 'pellet_no': '1', 'operator': 'op', 'unit': 'mm',
+            'readings': ['0.101', '0.102', '0.103', '0.104', '0.105'],
+        })
+        assert res.get_json()['ok'], res.get_json()
+
+    def setUp(self):
+        # Keep job files out of instance/exports
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(hg, 'EXPORT_DIR', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit(self) -> str:
+        res = self.client.get('/export/lot/pdf?lot=LOT-T')
+        self.assertEqual(res.status_code, 200)
+        job_id = res.get_json()['job_id']
+        deadline = time.monotonic() + 30
+        while True:
+            status = self.client.get(f'/export/status/{job_id}').get_json()
+            self.assertTrue(status['ok'], status)
+            if status['state'] == 'done':
+                return job_id
+            self.assertLess(time.monotonic(), deadline, 'export did not finish')
+            time.sleep(0.05)
+
+    def test_submit_poll_download(self):
+        job_id = self.submit()
+        res = self.client.get(f'/export/download/{job_id}')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data.startswith(b'%PDF-'))
+        self.assertIn('lot_LOT-T_', res.headers['Content-Disposition'])
+        res.close()
+
+    def test_missing_lot_is_rejected(self):
+        self.assertEqual(self.client.get('/export/lot/pdf').status_code, 400)
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get('/export/status/nope').status_code, 404)
+        self.assertEqual(self.client.get('/export/download/nope').status_code, 404)
+
+    def test_download_after_prune_is_404(self):
+        job_id = self.submit()
+        job = hg._export_jobs[job_id]
+        job.created -= hg.EXPORT_TTL + 1
+        old = time.time() - hg.EXPORT_TTL - 1
+        os.utime(job.path, (old, old))
+        hg._prune_exports()
+        self.assertFalse(os.path.exists(job.path))
+        self.assertEqual(self.client.get(f'/export/status/{job_id}').status_code, 404)
+        self.assertEqual(self.client.get(f'/export/download/{job_id}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import random
+import re
+import unittest
+
+# Import the app against a throwaway database
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+from app import parse_number
+
+# parse_number before the float() fast path was added
+_REF_RE = re.compile(r'(-?\d+(?:[.,]\d+)?)')
+
+def reference(s: str):
+    m = _REF_RE.search(s)
+    if not m:
+        return None
+    return float(m.group(1).replace(',', '.'))
+
+
+class ParseNumberTest(unittest.TestCase):
+    CASES = [
+        '', ' ', 'abc', '0', '42', '-7', '+00.289 mm', '-00.289 mm', '1,5', '-1,5',
+        '1.', '.5', '-.5', '+.5', '1.5.3', '1,5,6', '1-2', '--1', '+-1', '1+',
+        '1e5', '1E-3', 'inf', '-inf', 'nan', '1_000', '٣', '١٢٫٥', '  12.5  ',
+        '12.5\t', 'x12.5', 'P1: 0.157', '0.1 0.2', '\n3.14\n',
+        # Unit suffixes glued to the value
+        '0.157mm', '-0.157mm', '+00.289mm', '1,5in', '12.5MM', '5e', '1e5mm',
+        '1.5e', '3mm.5', '12abc3', 'mm', '1.mm', '.5mm', '1.5 mm extra',
+    ]
+
+    def assertSame(self, s):
+        got, want = parse_number(s), reference(s)
+        self.assertEqual((type(got), got), (type(want), want), repr(s))
+
+    def test_edge_cases(self):
+        for s in self.CASES:
+            self.assertSame(s)
+
+    def test_random_frames(self):
+        rng = random.Random(1234)
+        alphabet = '0123456789+-.,  emEin'
+        for _ in range(20000):
+            self.assertSame(''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 10))))
+
+
+if __name__ == '__main__':
+    unittest.main()